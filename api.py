@@ -1,30 +1,26 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.requests import Request
 from fastapi import status
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
 import os
+import contextlib
+import shutil
 import tempfile
 import hashlib
-from typing import Dict, Any, Optional
+import orjson
+from typing import Any, BinaryIO, Dict, Literal, Optional, Tuple
 from pydantic import BaseModel
 
 # Import Redis utilities
-from pm_dashboard.utils import redis_manager, cache_result
+from pm_dashboard.utils import redis_manager, cache_result, hash_key
 
 app = FastAPI(title="Project Management Dashboard API",
              description="API for the Project Management Dashboard with Redis Caching",
-             version="1.0.0")
-
-# Allow CORS for local React dev
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+             version="1.0.0",
+             default_response_class=ORJSONResponse)
 
 # Health check endpoints
 @app.get("/health")
@@ -39,16 +35,115 @@ async def health_check() -> Dict[str, str]:
     }
 
 # Cache control model
+# refresh recomputes the named stage and the stages after it, reusing the
+# cached stages before it; no_cache recomputes everything
 class CacheControl(BaseModel):
     no_cache: bool = False
+    refresh: Optional[Literal["ctx", "blockers", "actions"]] = None
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Uploads larger than this are rejected before they are parsed
+MAX_XLSX_BYTES = int(os.getenv('MAX_XLSX_BYTES', 20 * 1024 * 1024))
+
+def upload_too_large() -> HTTPException:
+    """Build the 413 error returned for uploads over the size limit."""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {MAX_XLSX_BYTES} byte upload limit"
+    )
+
+# Runs before the body is read: route dependencies only resolve after FastAPI
+# has already received and spooled the whole multipart form
+@app.middleware("http")
+async def upload_size_limit(request: Request, call_next):
+    """Reject dashboard uploads whose declared Content-Length is over the upload limit."""
+    if request.url.path == "/dashboard":
+        content_length = request.headers.get('content-length', '0')
+        if content_length.isdigit() and int(content_length) > MAX_XLSX_BYTES:
+            error = upload_too_large()
+            return ORJSONResponse(status_code=error.status_code, content={"detail": error.detail})
+    return await call_next(request)
+
+# Allow CORS for local React dev; added last so it also wraps the size-limit responses
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Pipeline stages cached separately, in order. Each stage is keyed on its own
+# inputs: the context on the file content, the blockers on the context, and
+# the actions on the context and blockers. A stage is only recomputed when
+# its inputs change, it was evicted, or a refresh targets it.
+CACHE_STAGES = ("ctx", "blockers", "actions")
 
 # Cache key generator
-def generate_cache_key(file_content: bytes) -> str:
-    """Generate a cache key based on file content."""
-    return f"dashboard:{hashlib.sha256(file_content).hexdigest()}"
+def generate_cache_key(digest: str, stage: str) -> str:
+    """Generate a cache key for a pipeline stage from the digest of its inputs."""
+    return f"dashboard:{stage}:{digest}"
+
+def stage_digest(*outputs: Any) -> str:
+    """Digest the upstream stage outputs a stage is computed from."""
+    return hash_key(orjson.dumps(outputs, option=orjson.OPT_SORT_KEYS))
+
+async def read_stage_cache(key: str, enabled: bool) -> Optional[Any]:
+    """Read a cached stage output, or None if caching is bypassed or unavailable."""
+    if not enabled or not redis_manager.is_connected():
+        return None
+    return await run_in_threadpool(redis_manager.get, key)
+
+class HashingWriter:
+    """File wrapper that hashes and size-checks bytes as they are written through it."""
+    
+    def __init__(self, file: BinaryIO, limit: int):
+        self.file = file
+        self.limit = limit
+        self.size = 0
+        self.hasher = hashlib.sha256()
+    
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.limit:
+            raise upload_too_large()
+        self.hasher.update(data)
+        return self.file.write(data)
+
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    """
+    Copy an uploaded file to a temp file, hashing it as the bytes go by.
+    
+    Args:
+        file: The uploaded file
+        
+    Returns:
+        Tuple of the temp file path and the hex SHA-256 digest of its content
+        
+    Raises:
+        HTTPException: If the file is larger than MAX_XLSX_BYTES
+    """
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
+            writer = HashingWriter(tmp, MAX_XLSX_BYTES)
+            # One pass over the data, in a single worker-thread hop rather
+            # than one per chunk
+            await run_in_threadpool(shutil.copyfileobj, file.file, writer, UPLOAD_CHUNK_SIZE)
+    except HTTPException:
+        discard_upload(tmp.name)
+        raise
+    return tmp.name, writer.hasher.hexdigest()
+
+def discard_upload(path: str) -> None:
+    """Remove a temporary upload file, ignoring one that is already gone."""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
 
 @app.post("/dashboard")
 async def dashboard(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     cache_control: CacheControl = Depends()
 ) -> Dict[str, Any]:
@@ -56,37 +151,61 @@ async def dashboard(
     Process project dashboard data with optional caching.
     
     Args:
+        background_tasks: Tasks run after the response is sent
         file: Excel file containing project data
         cache_control: Cache control parameters
         
     Returns:
         Processed dashboard data with summary, tasks, blockers, and actions
     """
-    # Read file content
-    file_content = await file.read()
-    
-    # Generate cache key
-    cache_key = generate_cache_key(file_content)
+    # Stream the upload to disk, hashing it for the cache key on the way
+    tmp_path, digest = await save_upload(file)
     
-    # Check cache if not explicitly bypassed
-    if not cache_control.no_cache and redis_manager.is_connected():
-        cached_data = redis_manager.get(cache_key)
-        if cached_data:
-            return {
-                **cached_data,
-                "cached": True,
-                "cache_key": cache_key
-            }
-    
-    # Save uploaded file to a temp location
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        tmp.write(file_content)
-        tmp_path = tmp.name
+    # Stages from this index on are recomputed
+    if cache_control.no_cache:
+        refresh_from = 0
+    elif cache_control.refresh:
+        refresh_from = CACHE_STAGES.index(cache_control.refresh)
+    else:
+        refresh_from = len(CACHE_STAGES)
     
     try:
-        # Process the file
-        from main import run_agents  # Lazy import to avoid circular imports
-        context, blockers, actions = run_agents(tmp_path)
+        # Each stage's key depends on the stage before it, so they are read in order
+        ctx_key = generate_cache_key(digest, "ctx")
+        context = await read_stage_cache(ctx_key, refresh_from > 0)
+        blockers = actions = None
+        if context is not None:
+            blockers = await read_stage_cache(
+                generate_cache_key(stage_digest(context), "blockers"), refresh_from > 1
+            )
+        if blockers is not None:
+            actions = await read_stage_cache(
+                generate_cache_key(stage_digest(context, blockers), "actions"), refresh_from > 2
+            )
+        hits = (context is not None, blockers is not None, actions is not None)
+        fully_cached = all(hits)
+        
+        if not fully_cached:
+            # Process the file, reusing whichever stages were cached; a requested
+            # refresh also bypasses the LLM response cache
+            from main import run_agents_async  # Lazy import to avoid circular imports
+            context, blockers, actions = await run_agents_async(
+                tmp_path, context, blockers, actions,
+                use_cache=refresh_from == len(CACHE_STAGES)
+            )
+            
+            # Cache the recomputed stage outputs if Redis is available
+            if redis_manager.is_connected():
+                stage_keys = (
+                    ctx_key,
+                    generate_cache_key(stage_digest(context), "blockers"),
+                    generate_cache_key(stage_digest(context, blockers), "actions"),
+                )
+                await run_in_threadpool(redis_manager.mset, {
+                    key: value
+                    for key, value, hit in zip(stage_keys, (context, blockers, actions), hits)
+                    if not hit
+                })
         
         # Prepare response
         response_data = {
@@ -96,25 +215,21 @@ async def dashboard(
             "tasks": context.get('tasks', []),
             "blockers": blockers.get('blockers', []),
             "actions": actions.get('actions', []),
-            "cached": False
+            "cached": fully_cached
         }
-        
-        # Cache the result if Redis is available
-        if redis_manager.is_connected():
-            redis_manager.set(cache_key, response_data)
-        
-        return response_data
+        if fully_cached:
+            response_data["cache_key"] = ctx_key
     except Exception as e:
+        # Error responses don't run background tasks, so clean up here
+        discard_upload(tmp_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing file: {str(e)}"
         )
-    finally:
-        # Clean up temp file
-        try:
-            os.remove(tmp_path)
-        except:
-            pass
+    
+    # Clean up the temp file after the response has been sent
+    background_tasks.add_task(discard_upload, tmp_path)
+    return response_data
 
 # Cache management endpoints
 @app.post("/cache/clear")
@@ -141,7 +256,7 @@ async def cache_stats():
         info = client.info()
         
         # Count dashboard cache keys
-        cache_keys = client.keys("dashboard:*")
+        cache_keys = [key.decode() for key in client.keys("dashboard:*")]
         
         return {
             "status": "success",
@@ -1,25 +1,111 @@
 # main.py
 
+import asyncio
+import functools
+import hashlib
+import json
+import orjson
 import pandas as pd
 import os
 from crewai import Agent, Task, Crew
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from pm_dashboard.config import close_async_openai, get_async_openai
+from pm_dashboard.utils import redis_manager
+
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Bound the number of in-flight OpenAI requests across concurrent uploads.
+# asyncio primitives bind to the loop that first waits on them, and run_agents
+# starts a new loop per call, so there's one semaphore per loop.
+LLM_CONCURRENCY = 8
+_LLM_SEMAPHORES = {}
+
+def _llm_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _LLM_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _LLM_SEMAPHORES[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return semaphore
+
 # Placeholder for CrewAI agent imports
 # from crewai import ...
 
+# Spreadsheet columns used by the agents, mapped to their task field names
+TASK_COLUMNS = {
+    'Goal Description': 'Task',
+    'Status': 'Status',
+    'Team Member': 'Owner',
+    'Month': 'DueDate',
+    'Goal Type': 'Goal Type'
+}
+
+# Sheets are truncated to this many task rows
+MAX_ROWS = int(os.getenv('MAX_ROWS', 10_000))
+
+# Cell values as read_excel(dtype=str, na_filter=False) gives them: text, with
+# blanks as empty strings
+def _cell_text(value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+# Read only the task columns, as strings. With python-calamine installed the
+# first sheet is read straight from the Rust parser and the frame is built from
+# column lists, skipping read_excel's parsing and inference machinery;
+# otherwise fall back to read_excel with openpyxl. Every task column is
+# present in the result, with '' where the sheet lacks it, so a sheet with
+# rows is never mistaken for an empty one.
+def _read_excel(filepath):
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return _read_excel_openpyxl(filepath)
+    # One extra row for the header
+    rows = CalamineWorkbook.from_path(filepath).get_sheet_by_index(0).to_python(nrows=MAX_ROWS + 1)
+    if not rows:
+        return pd.DataFrame(columns=list(TASK_COLUMNS))
+    header = [str(col) for col in rows[0]]
+    positions = {col: header.index(col) for col in TASK_COLUMNS if col in header}
+    body = rows[1:]
+    blank = [''] * len(body)
+    return pd.DataFrame({
+        col: [_cell_text(row[positions[col]]) for row in body] if col in positions else blank
+        for col in TASK_COLUMNS
+    })
+
+def _read_excel_openpyxl(filepath):
+    options = dict(engine='openpyxl', nrows=MAX_ROWS, dtype=str, na_filter=False)
+    frame = pd.read_excel(filepath, usecols=lambda col: col in TASK_COLUMNS, **options)
+    if frame.columns.empty:
+        # No task columns at all, which also drops the rows; read the first
+        # column just to keep them
+        frame = pd.read_excel(filepath, usecols=[0], **options)
+    return frame.reindex(columns=list(TASK_COLUMNS), fill_value='')
+
+# Parsed sheets are memoized on (path, mtime, size), so an unchanged file (e.g.
+# on every Streamlit rerun) is not parsed again and an edited one is. Only for
+# long-lived files: one-off uploads would just pin frames that are never hit.
+@functools.lru_cache(maxsize=8)
+def _read_excel_cached(filepath, mtime_ns, size):
+    return _read_excel(filepath)
+
 # Helper: Load Excel data
-def load_project_data(filepath):
+def load_project_data(filepath, memoize=False):
     try:
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Excel file not found: {filepath}")
         
-        df = pd.read_excel(filepath)
+        if memoize:
+            stat = os.stat(filepath)
+            # Copy so callers can't mutate the cached frame
+            df = _read_excel_cached(filepath, stat.st_mtime_ns, stat.st_size).copy()
+        else:
+            df = _read_excel(filepath)
         if df.empty:
             raise ValueError("Excel file is empty")
         
@@ -37,71 +123,126 @@ def load_project_data(filepath):
         })
 
 # Agent 1: Research Agent (robust to missing columns)
+# Returns the context along with the trimmed task frame so later stages can
+# filter it without rebuilding a DataFrame from the task dicts
 def research_agent_task(data):
     summary = f"Project has {len(data)} goals/tasks."
-    milestones = data['Month'].dropna().unique().tolist() if 'Month' in data else []
+    milestones = []
+    if 'Month' in data:
+        months = data['Month']
+        milestones = months[months.notna() & (months != '')].unique().tolist()
     updates = []  # No explicit updates column in this dataset
-    tasks = []
-    for _, row in data.iterrows():
-        task = {
-            'Task': row['Goal Description'] if 'Goal Description' in row else '',
-            'Status': row['Status'] if 'Status' in row else '',
-            'Owner': row['Team Member'] if 'Team Member' in row else '',
-            'DueDate': row['Month'] if 'Month' in row else '',
-            'Goal Type': row['Goal Type'] if 'Goal Type' in row else ''
-        }
-        tasks.append(task)
-    return {
+    # Missing columns are filled with empty strings, then the whole frame is
+    # converted in one pass rather than row by row
+    tasks_df = data.reindex(columns=list(TASK_COLUMNS), fill_value='').rename(columns=TASK_COLUMNS)
+    context = {
         'summary': summary,
         'milestones': milestones,
         'updates': updates,
-        'tasks': tasks
+        'tasks': tasks_df.to_dict(orient='records')
     }
+    return context, tasks_df
 
-# Agent 2: Blocker Detection Agent
-def blocker_detection_agent_task(context):
-    blockers = []
-    # Define which statuses count as blockers
-    blocker_statuses = ['blocked', 'delayed', 'overdue', 'not started', 'pending']
-    for task in context.get('tasks', []):
-        status = str(task.get('Status', '')).strip().lower()
-        if status in blocker_statuses:
-            blockers.append({
-                'task': task.get('Task', ''),
-                'reason': task.get('Status', ''),
-                'owner': task.get('Owner', ''),
-                'due': str(task.get('DueDate', ''))
-            })
-    # Use OpenAI LLM for blocker analysis if API key is present
-    if OPENAI_API_KEY and blockers:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        prompt = f"Given these blockers: {blockers}, categorize them by type or priority for a PM dashboard."
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": "You are a project risk analyst."},
-                      {"role": "user", "content": prompt}]
+# Task statuses that count as blockers, compared after strip().lower()
+_BLOCKER_STATUSES = frozenset({'blocked', 'delayed', 'overdue', 'not started', 'pending'})
+
+# Rule-based blocker extraction, shared by the blocker and planner agents.
+# Filters the task frame, building it from the context's task dicts when only
+# the context is available (e.g. it came from the cache).
+def detect_blockers(context, tasks_df=None):
+    if tasks_df is None:
+        # Missing task fields are resolved once per column rather than per task
+        tasks_df = pd.DataFrame.from_records(
+            context.get('tasks', []), columns=list(TASK_COLUMNS.values())
+        ).fillna('')
+    mask = tasks_df['Status'].astype(str).str.strip().str.lower().isin(_BLOCKER_STATUSES)
+    flagged = tasks_df.loc[mask, ['Task', 'Status', 'Owner', 'DueDate']]
+    flagged = flagged.set_axis(['task', 'reason', 'owner', 'due'], axis=1)
+    return flagged.assign(due=flagged['due'].astype(str)).to_dict(orient='records')
+
+# Shared LLM pass: a single JSON completion covers both the blocker analysis
+# and the action plan, instead of one round trip per agent
+PM_ANALYSIS_MODEL = "gpt-3.5-turbo"
+PM_ANALYSIS_SYSTEM_PROMPT = (
+    "You are a PM analyst. Output JSON with keys blockers_analysis and action_plan, "
+    "both plain-text strings (not objects or lists). "
+    "blockers_analysis categorizes the blockers by type or priority for a PM dashboard "
+    "(empty string if there are none); action_plan is a concise, prioritized action plan for the PM, "
+    "written as prose or numbered lines within the string."
+)
+
+# Completions are cached in Redis by prompt hash, so identical contexts skip the
+# OpenAI call entirely
+LLM_CACHE_TTL = 24 * 60 * 60
+
+def llm_cache_key(model, system_prompt, prompt):
+    digest = hashlib.blake2b(f"{model}|{system_prompt}|{prompt}".encode(), digest_size=16).hexdigest()
+    return f"llm:{digest}"
+
+# Renders a JSON value as display text. The model may still return objects or
+# lists despite the prompt, and their Python repr shouldn't reach the dashboard.
+# Top-level list items go on their own lines; nested lists stay inline.
+def _as_text(value, separator="\n"):
+    if isinstance(value, dict):
+        return "; ".join(
+            f"{key.replace('_', ' ').capitalize()}: {_as_text(item, ', ')}" for key, item in value.items()
         )
-        blockers.append({'llm_analysis': response.choices[0].message.content.strip()})
+    if isinstance(value, list):
+        return separator.join(_as_text(item, ', ') for item in value)
+    return str(value).strip() if value is not None else ''
+
+# Takes the context and blockers already serialized to JSON. With use_cache
+# off, a cached completion is ignored and replaced by a fresh one. Redis calls
+# are blocking, so they run in a worker thread to keep the loop free.
+async def pm_analysis_task(context_json, blockers_json, use_cache=True):
+    if not OPENAI_API_KEY:
+        return {}
+    prompt = f"Given the project context: {context_json} and blockers: {blockers_json}, analyze the blockers and plan the next actions."
+    cache_key = llm_cache_key(PM_ANALYSIS_MODEL, PM_ANALYSIS_SYSTEM_PROMPT, prompt)
+    if use_cache:
+        cached = await asyncio.to_thread(redis_manager.get, cache_key)
+        if cached is not None:
+            return cached
+    client = get_async_openai()
+    async with _llm_semaphore():
+        response = await client.chat.completions.create(
+            model=PM_ANALYSIS_MODEL,
+            messages=[{"role": "system", "content": PM_ANALYSIS_SYSTEM_PROMPT},
+                      {"role": "user", "content": prompt}],
+            response_format={'type': 'json_object'}
+        )
+    try:
+        analysis = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        print(f"Error parsing PM analysis response: {e}")
+        return {}
+    result = {
+        'blockers_analysis': _as_text(analysis.get('blockers_analysis')),
+        'action_plan': _as_text(analysis.get('action_plan'))
+    }
+    await asyncio.to_thread(redis_manager.set, cache_key, result, ex=LLM_CACHE_TTL)
+    return result
+
+# Agent 2: Blocker Detection Agent
+# Takes the rule-based blockers if they were already detected
+def blocker_detection_agent_task(context, blockers=None, analysis=None):
+    blockers = detect_blockers(context) if blockers is None else list(blockers)
+    # Attach the LLM blocker analysis if one was produced
+    if blockers and analysis and analysis.get('blockers_analysis'):
+        blockers.append({'llm_analysis': analysis['blockers_analysis']})
     return {'blockers': blockers}
 
 # Agent 3: Action Planner Agent
-def action_planner_agent_task(context, blockers):
+def action_planner_agent_task(context, blockers, analysis=None):
     actions = []
     for blocker in blockers.get('blockers', []):
         if isinstance(blocker, dict) and 'task' in blocker:
             actions.append(f"Follow up with {blocker['owner']} on '{blocker['task']}' (Reason: {blocker['reason']}, Due: {blocker['due']})")
     if not actions:
         actions.append("No immediate actions required. Monitor project progress.")
-    # Use OpenAI LLM for action planning if API key is present
-    if OPENAI_API_KEY:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        prompt = f"Given the project context: {context} and blockers: {blockers}, suggest a concise, prioritized action plan for the PM."
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": "You are a project action planner."},
-                      {"role": "user", "content": prompt}]
-        )
-        actions.append(response.choices[0].message.content.strip())
+    # Attach the LLM action plan if one was produced
+    if analysis and analysis.get('action_plan'):
+        actions.append(analysis['action_plan'])
     return {'actions': actions}
 
 # Custom agent wrappers for project processing
@@ -122,8 +263,8 @@ class BlockerDetectionAgent:
         self.goal = goal
         self.backstory = backstory
     
-    def process(self, context):
-        return blocker_detection_agent_task(context)
+    def process(self, context, blockers=None, analysis=None):
+        return blocker_detection_agent_task(context, blockers, analysis)
 
 class ActionPlannerAgent:
     def __init__(self, name, role, goal, backstory):
@@ -132,35 +273,63 @@ class ActionPlannerAgent:
         self.goal = goal
         self.backstory = backstory
     
-    def process(self, context, blockers):
-        return action_planner_agent_task(context, blockers)
+    def process(self, context, blockers, analysis=None):
+        return action_planner_agent_task(context, blockers, analysis)
 
 # Orchestration function
-def run_agents(filepath):
-    data = load_project_data(filepath)
+# Stage outputs that are already known (e.g. from the cache) can be passed in
+# and are returned as-is instead of being recomputed. memoize keeps the parsed
+# sheet for reuse; leave it off for temporary files such as API uploads.
+# use_cache=False bypasses the LLM response cache as well.
+async def run_agents_async(filepath, context=None, blockers=None, actions=None, memoize=False, use_cache=True):
     research_agent = ResearchAgent(
         name="Research Agent",
         role="Extracts project context",
         goal="Summarize project data and extract key milestones, updates, and tasks.",
         backstory="You are an expert project analyst, skilled at extracting structured context from project documents."
     )
-    context = research_agent.process(data)
     blocker_agent = BlockerDetectionAgent(
         name="Blocker Detection Agent",
         role="Finds blockers",
         goal="Identify risks, delays, and dependencies in the project.",
         backstory="You are a risk analyst specializing in project management bottlenecks."
     )
-    blockers = blocker_agent.process(context)
     planner_agent = ActionPlannerAgent(
         name="Action Planner Agent",
         role="Plans next steps",
         goal="Recommend next steps and actions for the project manager.",
         backstory="You are a project management assistant focused on actionable planning."
     )
-    actions = planner_agent.process(context, blockers)
+    tasks_df = None
+    if context is None:
+        data = load_project_data(filepath, memoize)
+        context, tasks_df = research_agent.process(data)
+    if blockers is None or actions is None:
+        # Both agents build on the rule-based blockers and share one LLM call
+        preliminary = {'blockers': detect_blockers(context, tasks_df)}
+        # Serialize the prompt payload once; the prompt also keys the LLM response cache
+        context_json = orjson.dumps(context).decode()
+        blockers_json = orjson.dumps(preliminary).decode()
+        analysis = await pm_analysis_task(context_json, blockers_json, use_cache)
+        if blockers is None:
+            blockers = blocker_agent.process(context, preliminary['blockers'], analysis)
+        if actions is None:
+            actions = planner_agent.process(context, preliminary, analysis)
     return context, blockers, actions
 
+# Synchronous entry point for callers without a running event loop (CLI, Streamlit)
+# The loop only lives for this call, so its OpenAI client is closed and its
+# semaphore dropped before it ends. The API's loop outlives each request and
+# keeps both.
+def run_agents(filepath):
+    async def run_and_close():
+        try:
+            return await run_agents_async(filepath, memoize=True)
+        finally:
+            _LLM_SEMAPHORES.pop(asyncio.get_running_loop(), None)
+            await close_async_openai()
+    return asyncio.run(run_and_close())
+
 if __name__ == "__main__":
     context, blockers, actions = run_agents('PM Dashboard sample dataset.xlsx')
     print('Context:', context)
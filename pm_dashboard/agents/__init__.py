@@ -1,14 +1,34 @@
 # PM Dashboard Agents Package
 # Multi-agent system for project management insights
 
+from functools import lru_cache
+
+from config import AGENT_CONFIG
 from .base_agent import BaseAgent
 from .research_agent import ResearchAgent  
 from .blocker_detection_agent import BlockerDetectionAgent
 from .action_planner_agent import ActionPlannerAgent
 
+_AGENT_CLASSES = {
+    'research': ResearchAgent,
+    'blocker_detection': BlockerDetectionAgent,
+    'action_planner': ActionPlannerAgent,
+}
+
+@lru_cache(maxsize=None)
+def make_agent(name: str) -> BaseAgent:
+    """Create the agent configured under `name` in AGENT_CONFIG, once per process.
+    
+    Lives here rather than in the Streamlit script, which is re-executed into a
+    fresh module on every rerun; this module stays in sys.modules, so the cache
+    does too.
+    """
+    return _AGENT_CLASSES[name](AGENT_CONFIG[name])
+
 __all__ = [
     'BaseAgent',
     'ResearchAgent', 
     'BlockerDetectionAgent',
-    'ActionPlannerAgent'
+    'ActionPlannerAgent',
+    'make_agent'
 ]
\ No newline at end of file
@@ -1,8 +1,59 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Final
 import json
+import orjson
 from datetime import datetime, timedelta
 from .base_agent import BaseAgent
 
+# Static prompt text, built once at import; only the project and blocker data are filled in per call
+_PLANNER_SYSTEM_PROMPT: Final[str] = """You are an experienced project manager responsible for creating clear, 
+actionable plans. Based on the project information and identified blockers/risks, create 
+a prioritized action plan with specific, time-bound tasks.
+
+Your plan should include:
+1. Immediate actions to unblock critical path items
+2. High-priority tasks that will drive the most value
+3. Resource allocation recommendations
+4. Timeline adjustments if needed
+5. Dependencies between tasks
+
+Be specific, realistic, and focus on outcomes.
+"""
+
+_PLANNER_RESPONSE_SCHEMA: Final[str] = """{
+    "actions": [
+        {
+            "task": "Specific action to take",
+            "owner": "Who should be responsible",
+            "due_date": "When it should be completed (YYYY-MM-DD)",
+            "priority": "High/Medium/Low",
+            "status": "Not Started/In Progress/Blocked/Completed",
+            "dependencies": ["Task ID or description this depends on"],
+            "success_metrics": "How to know this is done correctly"
+        }
+    ],
+    "priority_tasks": [
+        "The 3-5 most critical tasks that need immediate attention"
+    ],
+    "schedule_recommendations": [
+        "Any suggested changes to the project timeline or milestones"
+    ],
+    "resource_recommendations": [
+        "Any suggestions for reallocating or adding resources"
+    ],
+    "summary": "A brief overview of the recommended approach"
+}"""
+
+_PLANNER_USER_TEMPLATE: Final[str] = """Project Information:
+{project_info}
+
+Identified Blockers and Risks:
+{blockers_info}
+
+Based on this information, please generate a comprehensive action plan with the following structure:
+
+{response_schema}
+"""
+
 class ActionPlannerAgent(BaseAgent):
     """Agent responsible for planning next steps and actions for a project."""
     
@@ -30,9 +81,9 @@ class ActionPlannerAgent(BaseAgent):
                 "summary": "No project data available to generate action plan"
             }
             
-        # Prepare data for the LLM
-        project_info = json.dumps(project_data, indent=2)
-        blockers_info = json.dumps(blockers_data, indent=2)
+        # Prepare compact data for the LLM
+        project_info = orjson.dumps(project_data).decode()
+        blockers_info = orjson.dumps(blockers_data).decode()
         
         # Generate the action plan
         action_plan = await self._generate_action_plan(project_info, blockers_info)
@@ -49,54 +100,13 @@ class ActionPlannerAgent(BaseAgent):
         Returns:
             Dict containing the action plan
         """
-        system_prompt = """You are an experienced project manager responsible for creating clear, 
-        actionable plans. Based on the project information and identified blockers/risks, create 
-        a prioritized action plan with specific, time-bound tasks.
-        
-        Your plan should include:
-        1. Immediate actions to unblock critical path items
-        2. High-priority tasks that will drive the most value
-        3. Resource allocation recommendations
-        4. Timeline adjustments if needed
-        5. Dependencies between tasks
-        
-        Be specific, realistic, and focus on outcomes.
-        """
-        
-        user_prompt = f"""Project Information:
-        {project_info}
-        
-        Identified Blockers and Risks:
-        {blockers_info}
-        
-        Based on this information, please generate a comprehensive action plan with the following structure:
-        
-        {{
-            "actions": [
-                {{
-                    "task": "Specific action to take",
-                    "owner": "Who should be responsible",
-                    "due_date": "When it should be completed (YYYY-MM-DD)",
-                    "priority": "High/Medium/Low",
-                    "status": "Not Started/In Progress/Blocked/Completed",
-                    "dependencies": ["Task ID or description this depends on"],
-                    "success_metrics": "How to know this is done correctly"
-                }}
-            ],
-            "priority_tasks": [
-                "The 3-5 most critical tasks that need immediate attention"
-            ],
-            "schedule_recommendations": [
-                "Any suggested changes to the project timeline or milestones"
-            ],
-            "resource_recommendations": [
-                "Any suggestions for reallocating or adding resources"
-            ],
-            "summary": "A brief overview of the recommended approach"
-        }}
-        """
+        user_prompt = _PLANNER_USER_TEMPLATE.format_map({
+            "project_info": project_info,
+            "blockers_info": blockers_info,
+            "response_schema": _PLANNER_RESPONSE_SCHEMA
+        })
         
-        response = await self._call_llm(user_prompt, system_prompt)
+        response = await self._call_llm(user_prompt, _PLANNER_SYSTEM_PROMPT)
         
         try:
             # Try to parse the response as JSON
@@ -1,12 +1,39 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
 import os
 import openai
+import orjson
 from dotenv import load_dotenv
 import json
+from config import get_async_openai
+from utils import hash_key
 
 load_dotenv()
 
+# Shared decoder; raw_decode parses one JSON value and ignores anything after it
+_JSON_DECODER = json.JSONDecoder()
+
+# How often a submitted batch is checked for completion, in seconds
+BATCH_POLL_INTERVAL_SECONDS = 10
+
+# Batch requests of a background analysis, keyed by agent and prompt hash, each
+# holding its batch ID and, once finished, its response. Setting this to a dict
+# that outlives the run (e.g. one kept in the Streamlit session state) makes
+# batch calls non-blocking: each call submits or checks its batch once and
+# raises BatchPending until the response is in, so a later run picks up where
+# this one stopped. The caller clears it once the whole analysis is done.
+batch_registry: ContextVar[Optional[Dict[str, Dict[str, str]]]] = ContextVar("batch_registry", default=None)
+
+class BatchPending(Exception):
+    """Raised in background batch mode while a submitted batch is still running."""
+    
+    def __init__(self, agent_type: str, batch_id: str):
+        super().__init__(f"{agent_type} batch {batch_id} is still processing")
+        self.agent_type = agent_type
+        self.batch_id = batch_id
+
 class BaseAgent(ABC):
     """Base class for all agents in the PM Dashboard system."""
     
@@ -23,9 +50,11 @@ class BaseAgent(ABC):
         
         if not self.openai_api_key:
             raise ValueError("OpenAI API key not found in environment variables.")
-        
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=self.openai_api_key)
+    
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        """Get the async OpenAI client shared by all agents on the running event loop."""
+        return get_async_openai()
     
     @abstractmethod
     async def process(self, input_data: Any) -> Dict[str, Any]:
@@ -49,15 +78,13 @@ class BaseAgent(ABC):
         Returns:
             The model's response as a string
         """
-        messages = []
+        messages = self._build_messages(prompt, system_message)
         
-        if system_message:
-            messages.append({"role": "system", "content": system_message})
-            
-        messages.append({"role": "user", "content": prompt})
+        if self.config.get("use_batch_api"):
+            return await self._call_llm_batch(messages)
         
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.config["model"],
                 messages=messages,
                 temperature=self.config["temperature"],
@@ -68,6 +95,169 @@ class BaseAgent(ABC):
             print(f"Error calling OpenAI API: {e}")
             raise
     
+    async def _stream_llm(self, prompt: str, system_message: str = "") -> AsyncIterator[str]:
+        """Make a streaming call to the OpenAI API.
+        
+        Args:
+            prompt: The user's prompt
+            system_message: Optional system message to guide the model's behavior
+            
+        Yields:
+            Pieces of the model's response as they arrive
+        """
+        messages = self._build_messages(prompt, system_message)
+        
+        # Batch results arrive all at once, as a single piece
+        if self.config.get("use_batch_api"):
+            yield await self._call_llm_batch(messages)
+            return
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.config["model"],
+                messages=messages,
+                temperature=self.config["temperature"],
+                max_tokens=self.config["max_tokens"],
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            print(f"Error calling OpenAI API: {e}")
+            raise
+    
+    async def _call_llm_batch(self, messages: List[Dict[str, str]]) -> str:
+        """Run a chat completion through the OpenAI Batch API.
+        
+        Batched requests cost less but may take up to the 24h completion window.
+        Without a batch_registry this waits for the batch; with one, it returns
+        the response if the batch is done and raises BatchPending otherwise.
+        
+        Args:
+            messages: Chat messages for the request
+            
+        Returns:
+            The model's response as a string
+            
+        Raises:
+            BatchPending: If the batch was just submitted or is still running
+        """
+        registry = batch_registry.get()
+        body = {
+            "model": self.config["model"],
+            "messages": messages,
+            "temperature": self.config["temperature"],
+            "max_tokens": self.config["max_tokens"]
+        }
+        
+        if registry is None:
+            # Nothing outlives this call to resume from, so wait here
+            return await self._wait_for_batch(await self._submit_batch(body))
+        
+        request_key = f"{self.agent_type}:{hash_key(orjson.dumps(body))}"
+        entry = registry.get(request_key)
+        if entry is None:
+            entry = registry[request_key] = {"batch_id": await self._submit_batch(body)}
+            raise BatchPending(self.agent_type, entry["batch_id"])
+        
+        if "response" not in entry:
+            try:
+                response = await self._check_batch(entry["batch_id"])
+            except RuntimeError as e:
+                # The batch itself failed; forget it so the next run resubmits
+                print(f"Error calling OpenAI Batch API: {e}")
+                registry.pop(request_key, None)
+                raise
+            if response is None:
+                raise BatchPending(self.agent_type, entry["batch_id"])
+            entry["response"] = response
+        return entry["response"]
+    
+    async def _submit_batch(self, body: Dict[str, Any]) -> str:
+        """Upload a single chat completion request as a batch.
+        
+        Args:
+            body: Chat completion request body
+            
+        Returns:
+            ID of the created batch
+        """
+        request = {
+            "custom_id": self.agent_type,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body
+        }
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", orjson.dumps(request) + b"\n"),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        print(f"{self.agent_type}: submitted batch {batch.id}")
+        return batch.id
+    
+    async def _wait_for_batch(self, batch_id: str) -> str:
+        """Poll a batch until it finishes and return its single response.
+        
+        Args:
+            batch_id: ID of the batch to wait for
+            
+        Returns:
+            The model's response as a string
+        """
+        while (response := await self._check_batch(batch_id)) is None:
+            await asyncio.sleep(BATCH_POLL_INTERVAL_SECONDS)
+        return response
+    
+    async def _check_batch(self, batch_id: str) -> Optional[str]:
+        """Check a batch once and return its single response if it has finished.
+        
+        Args:
+            batch_id: ID of the batch to check
+            
+        Returns:
+            The model's response as a string, or None while the batch is still running
+            
+        Raises:
+            RuntimeError: If the batch or its request failed
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} {batch.status}")
+        if batch.status != "completed":
+            return None
+        
+        if not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch_id} completed without output")
+        output = await self.client.files.content(batch.output_file_id)
+        result = orjson.loads(output.content.splitlines()[0])
+        if result.get("error"):
+            raise RuntimeError(f"Batch {batch_id} request failed: {result['error']}")
+        return result["response"]["body"]["choices"][0]["message"]["content"].strip()
+    
+    def _build_messages(self, prompt: str, system_message: str = "") -> List[Dict[str, str]]:
+        """Build the chat messages for an LLM call.
+        
+        Args:
+            prompt: The user's prompt
+            system_message: Optional system message to guide the model's behavior
+            
+        Returns:
+            List of chat messages
+        """
+        messages = []
+        
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+            
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
     def _parse_json_response(self, response: str) -> Dict[str, Any]:
         """Parse a JSON response from the LLM.
         
@@ -78,11 +268,13 @@ class BaseAgent(ABC):
             Parsed JSON as a dictionary
         """
         try:
-            # Try to find JSON in the response (in case there's extra text)
+            # Decode from the first brace in a single pass, so leading text,
+            # markdown fences and trailing prose are all skipped
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            json_str = response[start_idx:end_idx]
-            return json.loads(json_str)
+            if start_idx == -1:
+                raise json.JSONDecodeError("No JSON object found", response, 0)
+            parsed, _ = _JSON_DECODER.raw_decode(response, start_idx)
+            return parsed
         except json.JSONDecodeError as e:
             print(f"Error parsing JSON response: {e}")
             print(f"Response was: {response}")
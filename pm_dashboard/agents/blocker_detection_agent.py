@@ -1,7 +1,53 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Final
 import json
+import orjson
 from .base_agent import BaseAgent
 
+# Static prompt text, built once at import; only the project data is filled in per call
+_BLOCKER_SYSTEM_PROMPT: Final[str] = """You are an experienced project manager who excels at identifying potential 
+blockers and risks in software projects. Analyze the provided project information and identify:
+
+1. Blockers: Issues that are currently preventing progress (e.g., missing dependencies, 
+   team member unavailability, technical challenges)
+2. Risks: Potential issues that could become blockers if not addressed
+
+For each item, provide:
+- A clear description
+- The area/component it affects
+- Severity (Low, Medium, High, Critical)
+- Recommended actions to resolve or mitigate
+
+Return the information in a structured JSON format.
+"""
+
+_BLOCKER_RESPONSE_SCHEMA: Final[str] = """{
+    "blockers": [
+        {
+            "description": "Description of the blocker",
+            "area": "Area/component affected",
+            "severity": "High/Medium/Low/Critical",
+            "recommended_actions": ["Action 1", "Action 2"]
+        }
+    ],
+    "risks": [
+        {
+            "description": "Description of the risk",
+            "potential_impact": "What could happen if not addressed",
+            "likelihood": "High/Medium/Low",
+            "mitigation_strategies": ["Strategy 1", "Strategy 2"]
+        }
+    ],
+    "summary": "Brief summary of the key findings"
+}"""
+
+_BLOCKER_USER_TEMPLATE: Final[str] = """Analyze the following project information and identify blockers and risks:
+
+{project_info}
+
+Return the analysis in a valid JSON format with the following structure:
+{response_schema}
+"""
+
 class BlockerDetectionAgent(BaseAgent):
     """Agent responsible for identifying potential blockers and risks in a project."""
     
@@ -23,8 +69,8 @@ class BlockerDetectionAgent(BaseAgent):
         if not project_data:
             return {"blockers": [], "risks": [], "summary": "No project data provided for analysis"}
             
-        # Convert project data to a string representation for the LLM
-        project_info = json.dumps(project_data, indent=2)
+        # Convert project data to a compact string representation for the LLM
+        project_info = orjson.dumps(project_data).decode()
         
         # Analyze the project data for blockers and risks
         analysis = await self._analyze_for_blockers(project_info)
@@ -40,49 +86,12 @@ class BlockerDetectionAgent(BaseAgent):
         Returns:
             Dict containing blockers and risks analysis
         """
-        system_prompt = """You are an experienced project manager who excels at identifying potential 
-        blockers and risks in software projects. Analyze the provided project information and identify:
-        
-        1. Blockers: Issues that are currently preventing progress (e.g., missing dependencies, 
-           team member unavailability, technical challenges)
-        2. Risks: Potential issues that could become blockers if not addressed
-        
-        For each item, provide:
-        - A clear description
-        - The area/component it affects
-        - Severity (Low, Medium, High, Critical)
-        - Recommended actions to resolve or mitigate
-        
-        Return the information in a structured JSON format.
-        """
-        
-        user_prompt = f"""Analyze the following project information and identify blockers and risks:
-        
-        {project_info}
-        
-        Return the analysis in a valid JSON format with the following structure:
-        {{
-            "blockers": [
-                {{
-                    "description": "Description of the blocker",
-                    "area": "Area/component affected",
-                    "severity": "High/Medium/Low/Critical",
-                    "recommended_actions": ["Action 1", "Action 2"]
-                }}
-            ],
-            "risks": [
-                {{
-                    "description": "Description of the risk",
-                    "potential_impact": "What could happen if not addressed",
-                    "likelihood": "High/Medium/Low",
-                    "mitigation_strategies": ["Strategy 1", "Strategy 2"]
-                }}
-            ],
-            "summary": "Brief summary of the key findings"
-        }}
-        """
+        user_prompt = _BLOCKER_USER_TEMPLATE.format_map({
+            "project_info": project_info,
+            "response_schema": _BLOCKER_RESPONSE_SCHEMA
+        })
         
-        response = await self._call_llm(user_prompt, system_prompt)
+        response = await self._call_llm(user_prompt, _BLOCKER_SYSTEM_PROMPT)
         
         try:
             # Try to parse the response as JSON
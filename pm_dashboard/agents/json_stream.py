@@ -0,0 +1,95 @@
+from typing import Dict, Any, List, Optional, Tuple
+import json
+
+class IncrementalJsonParser:
+    """Incrementally parse a JSON object streamed from an LLM.
+
+    Tracks brace/bracket depth as chunks arrive and decodes each top-level member
+    on its own as soon as its separating comma or the closing brace is seen, so
+    completed fields are available before the stream ends and the text is only
+    scanned once. Anything before the opening brace (e.g. a markdown fence) and
+    after the closing brace is ignored.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser."""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member: List[str] = []
+        self._result: Dict[str, Any] = {}
+        self._complete = False
+        self._malformed = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume the next chunk of the stream.
+
+        Args:
+            chunk: The next piece of the response text
+
+        Returns:
+            (key, value) pairs of the top-level members completed by this chunk
+        """
+        completed: List[Tuple[str, Any]] = []
+        if self._complete:
+            return completed
+
+        start = 0
+        for i, char in enumerate(chunk):
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    start = i + 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._member.append(chunk[start:i])
+                    self._flush(completed)
+                    self._complete = True
+                    break
+            elif char == ',' and self._depth == 1:
+                self._member.append(chunk[start:i])
+                self._flush(completed)
+                start = i + 1
+        else:
+            if self._depth > 0:
+                self._member.append(chunk[start:])
+
+        return completed
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Get the parsed object.
+
+        Returns:
+            The full object if the stream closed it and every member decoded, else None
+        """
+        if self._complete and not self._malformed:
+            return self._result
+        return None
+
+    def _flush(self, completed: List[Tuple[str, Any]]) -> None:
+        """Decode the buffered top-level member and record it."""
+        text = "".join(self._member).strip()
+        self._member.clear()
+        if not text:
+            return
+        try:
+            member = json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            self._malformed = True
+            return
+        self._result.update(member)
+        completed.extend(member.items())
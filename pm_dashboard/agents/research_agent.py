@@ -1,7 +1,57 @@
-from typing import Dict, Any, List, Optional
-import json
+from typing import Dict, Any, List, Optional, Final
+import asyncio
+import re
 from datetime import datetime
+import msgspec
+from utils import hash_key, redis_manager
 from .base_agent import BaseAgent
+from .json_stream import IncrementalJsonParser
+
+# How long research results are cached, in seconds
+LLM_CACHE_TTL = 24 * 60 * 60
+
+class ResearchResult(msgspec.Struct, omit_defaults=True):
+    """Schema of the Research Agent's response; fields outside it are dropped."""
+    
+    project_name: str = ""
+    description: str = ""
+    milestones: List[Any] = []
+    team_members: List[Any] = []
+    current_tasks: List[Any] = []
+    recent_updates: List[Any] = []
+    # Not requested in the prompt, but shown on the dashboard when present
+    status: Optional[str] = None
+    start_date: Optional[str] = None
+
+# Typed decoder, built once
+_RESEARCH_DECODER = msgspec.json.Decoder(ResearchResult)
+
+# Runs of whitespace, collapsed when json_repair isn't available
+_WS_RE = re.compile(r"\s+")
+
+# Separates the text sources in the combined prompt
+_SOURCE_SEPARATOR = "\n---\n"
+
+# Static prompt text, built once at import; only the project text is filled in per call
+_SYSTEM_PROMPT: Final[str] = """You are a research assistant that extracts and structures project information. 
+Analyze the provided project data and extract the following information in JSON format:
+- project_name: Name of the project
+- description: Brief project description
+- milestones: List of key milestones with their due dates and status
+- team_members: List of team members and their roles
+- current_tasks: List of current tasks with their status and priority
+- recent_updates: List of recent updates with timestamps
+"""
+
+_USER_PROMPT_TMPL: Final[str] = """Analyze the following project information and extract the requested details:
+
+{text}
+
+Return the information in a valid JSON format with the structure specified above.
+"""
+
+# Stands in for the system prompt in cache keys, so it isn't rehashed per call
+_SYSTEM_PROMPT_DIGEST: Final[str] = hash_key(_SYSTEM_PROMPT)
 
 class ResearchAgent(BaseAgent):
     """Agent responsible for gathering and structuring project information."""
@@ -10,106 +60,181 @@ class ResearchAgent(BaseAgent):
         """Initialize the Research Agent."""
         super().__init__("research", config)
         
-    async def process(self, project_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def process(
+        self,
+        project_data: Dict[str, Any],
+        updates: Optional[asyncio.Queue] = None
+    ) -> Dict[str, Any]:
         """Process project data and extract structured information.
         
         Args:
             project_data: Raw project data including documents, chat logs, etc.
+            updates: Optional queue that receives a (field, value) pair for each
+                top-level field as soon as it has streamed in, then None when done
             
         Returns:
             Dict containing structured project information
         """
         print("Research Agent: Processing project data...")
         
-        # Extract text from various sources
-        text_sources = self._extract_text_sources(project_data)
-        
-        # Analyze the text to extract structured information
-        structured_data = await self._analyze_text_sources(text_sources)
+        try:
+            # Extract text from various sources into one combined text
+            combined_text = self._extract_text_sources(project_data)
+            
+            # Analyze the text to extract structured information
+            structured_data = await self._analyze_text_sources(combined_text, updates)
+        finally:
+            if updates is not None:
+                await updates.put(None)
         
         return structured_data
     
-    def _extract_text_sources(self, project_data: Dict[str, Any]) -> List[str]:
+    def _extract_text_sources(self, project_data: Dict[str, Any]) -> str:
         """Extract text from various sources in the project data.
         
+        Every piece is appended to a single list that is joined once, rather than
+        joining each source and then joining the sources again.
+        
         Args:
             project_data: Raw project data
             
         Returns:
-            List of text strings from different sources
+            Text from the different sources, separated by "---" lines
         """
-        text_sources = []
+        parts: List[str] = []
+        
+        def start_source() -> None:
+            if parts:
+                parts.append(_SOURCE_SEPARATOR)
         
         # Extract from documents
-        if "documents" in project_data:
-            for doc in project_data["documents"]:
-                if "content" in doc:
-                    text_sources.append(f"Document: {doc.get('title', 'Untitled')}\n{doc['content']}")
+        for doc in project_data.get("documents", ()):
+            if "content" in doc:
+                start_source()
+                parts.append(f"Document: {doc.get('title', 'Untitled')}\n{doc['content']}")
         
         # Extract from chat logs
-        if "chats" in project_data:
-            chat_texts = []
-            for chat in project_data["chats"]:
-                chat_text = f"{chat.get('sender', 'User')} ({chat.get('timestamp', '')}): {chat.get('message', '')}"
-                chat_texts.append(chat_text)
-            if chat_texts:
-                text_sources.append("Chat Logs:\n" + "\n".join(chat_texts))
+        chats = project_data.get("chats")
+        if chats:
+            start_source()
+            parts.append("Chat Logs:")
+            for chat in chats:
+                chat_get = chat.get
+                parts.append(
+                    f"\n{chat_get('sender', 'User')} ({chat_get('timestamp', '')}): {chat_get('message', '')}"
+                )
         
         # Add any direct text content
         if "text_content" in project_data:
-            if isinstance(project_data["text_content"], list):
-                text_sources.extend(project_data["text_content"])
-            else:
-                text_sources.append(str(project_data["text_content"]))
-        
-        return text_sources
+            text_content = project_data["text_content"]
+            if not isinstance(text_content, list):
+                text_content = [str(text_content)]
+            for text in text_content:
+                start_source()
+                parts.append(text)
+        
+        return "".join(parts)
     
-    async def _analyze_text_sources(self, text_sources: List[str]) -> Dict[str, Any]:
+    async def _analyze_text_sources(
+        self,
+        combined_text: str,
+        updates: Optional[asyncio.Queue] = None
+    ) -> Dict[str, Any]:
         """Analyze text sources to extract structured project information.
         
         Args:
-            text_sources: List of text strings from different sources
+            combined_text: Text from the different sources, as built by _extract_text_sources
+            updates: Optional queue that receives each top-level field as it completes
             
         Returns:
             Dict containing structured project information
         """
-        if not text_sources:
+        if not combined_text:
             return {}
-            
-        combined_text = "\n---\n".join(text_sources)
-        
-        system_prompt = """You are a research assistant that extracts and structures project information. 
-        Analyze the provided project data and extract the following information in JSON format:
-        - project_name: Name of the project
-        - description: Brief project description
-        - milestones: List of key milestones with their due dates and status
-        - team_members: List of team members and their roles
-        - current_tasks: List of current tasks with their status and priority
-        - recent_updates: List of recent updates with timestamps
-        """
         
-        user_prompt = f"""Analyze the following project information and extract the requested details:
+        user_prompt = _USER_PROMPT_TMPL.format_map({"text": combined_text})
         
-        {combined_text}
+        # Reuse the result of an identical earlier request
+        cache_key = "llm:" + hash_key(f"{self.config['model']}|{_SYSTEM_PROMPT_DIGEST}|{user_prompt}")
+        cached = redis_manager.get(cache_key)
+        if isinstance(cached, dict):
+            return cached
         
-        Return the information in a valid JSON format with the structure specified above.
-        """
+        structured_data = await self._stream_structured_response(user_prompt, _SYSTEM_PROMPT, updates)
+        if "error" not in structured_data:
+            redis_manager.set(cache_key, structured_data, ex=LLM_CACHE_TTL)
+        return structured_data
+    
+    async def _stream_structured_response(
+        self,
+        user_prompt: str,
+        system_prompt: str,
+        updates: Optional[asyncio.Queue] = None
+    ) -> Dict[str, Any]:
+        """Stream the LLM response and parse it into structured project information.
         
-        response = await self._call_llm(user_prompt, system_prompt)
+        Args:
+            user_prompt: The research prompt
+            system_prompt: The research system message
+            updates: Optional queue that receives each top-level field as it completes
+            
+        Returns:
+            Dict containing structured project information
+        """
+        # Stream the response, decoding each top-level field as soon as it is complete
+        parser = IncrementalJsonParser()
+        chunks = []
+        async for chunk in self._stream_llm(user_prompt, system_prompt):
+            chunks.append(chunk)
+            for field in parser.feed(chunk):
+                if updates is not None:
+                    await updates.put(field)
+        response = "".join(chunks)
+        
+        structured_data = parser.result()
+        if structured_data is not None:
+            return self._to_research_dict(structured_data)
+        
+        # The stream did not contain a well-formed object; decode the outermost
+        # braces against the schema in one pass
+        object_text = response[response.find('{'):response.rfind('}') + 1]
+        try:
+            return msgspec.to_builtins(_RESEARCH_DECODER.decode(object_text))
+        except msgspec.DecodeError:
+            pass
         
+        # Repair malformed output (unquoted keys, trailing commas, truncation, ...);
+        # only needed on this rare path, so imported here
         try:
-            # Try to parse the response as JSON
-            structured_data = self._parse_json_response(response)
-            return structured_data
-        except json.JSONDecodeError:
-            # If parsing fails, try to fix common JSON issues
-            fixed_response = response.replace("\n", " ").replace("  ", " ")
+            import json_repair
+            repaired = json_repair.loads(response)
+        except ImportError:
+            # Collapsing whitespace in one pass still recovers the most common
+            # failure, raw newlines inside string values
             try:
-                structured_data = json.loads(fixed_response)
-                return structured_data
-            except json.JSONDecodeError:
-                print("Failed to parse JSON response from Research Agent")
-                return {
-                    "error": "Failed to parse research data",
-                    "raw_response": response
-                }
+                repaired = msgspec.json.decode(_WS_RE.sub(" ", object_text))
+            except msgspec.DecodeError:
+                repaired = None
+        if isinstance(repaired, dict) and repaired:
+            return self._to_research_dict(repaired)
+        
+        print("Failed to parse JSON response from Research Agent")
+        return {
+            "error": "Failed to parse research data",
+            "raw_response": response
+        }
+    
+    @staticmethod
+    def _to_research_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a decoded response to the research schema.
+        
+        Args:
+            data: Decoded response object
+            
+        Returns:
+            The schema's fields, or the object unchanged if it doesn't fit the schema
+        """
+        try:
+            return msgspec.to_builtins(msgspec.convert(data, ResearchResult))
+        except msgspec.ValidationError:
+            return data
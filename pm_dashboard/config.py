@@ -1,3 +1,4 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -19,22 +20,70 @@ TEMPLATES_DIR.mkdir(exist_ok=True)
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Attempts per request; the client backs off exponentially between them
+OPENAI_MAX_RETRIES = 5
+
+# Shared OpenAI clients, one per event loop (see get_async_openai)
+_ASYNC_OPENAI_CLIENTS = {}
+
+def get_async_openai():
+    """Get the shared async OpenAI client for the running event loop.
+    
+    All agents share one client, whose HTTP/2 connection pool keeps connections
+    alive between calls so concurrent requests multiplex over an established
+    connection instead of each paying for a TLS handshake. Pooled connections
+    can't outlive the loop that opened them, and each Streamlit rerun runs in a
+    fresh loop, so a client is created per loop. Whoever runs the loop must
+    await close_async_openai() before it ends, or the client, its sockets and
+    the loop itself are never released. openai and httpx are imported on first
+    use to keep them off the app's import path.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_OPENAI_CLIENTS.get(loop)
+    if client is None:
+        import httpx
+        import openai
+        
+        client = _ASYNC_OPENAI_CLIENTS[loop] = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        )
+    return client
+
+async def close_async_openai():
+    """Close and drop the running event loop's OpenAI client, if it has one."""
+    client = _ASYNC_OPENAI_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+# Run agent LLM calls through the OpenAI Batch API: about half the cost, but
+# results can take minutes to hours, so only for non-interactive analysis
+USE_BATCH_API = os.getenv("USE_BATCH_API", "false").lower() == "true"
+
 # Agent Configuration
 AGENT_CONFIG = {
     "research": {
         "model": "gpt-3.5-turbo",
         "temperature": 0.3,
         "max_tokens": 2000,
+        "use_batch_api": USE_BATCH_API,
     },
     "blocker_detection": {
         "model": "gpt-4",
         "temperature": 0.2,
         "max_tokens": 1500,
+        "use_batch_api": USE_BATCH_API,
     },
     "action_planner": {
         "model": "gpt-4",
         "temperature": 0.2,
         "max_tokens": 2000,
+        "use_batch_api": USE_BATCH_API,
     }
 }
 
@@ -5,15 +5,16 @@ import random
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
+import orjson
 import streamlit as st
-import pandas as pd
-import openai
 from dotenv import load_dotenv
 
-from config import AGENT_CONFIG, MOCK_PROJECTS, STATUS_OPTIONS, PRIORITY_LEVELS
-from agents.research_agent import ResearchAgent
-from agents.blocker_detection_agent import BlockerDetectionAgent
-from agents.action_planner_agent import ActionPlannerAgent
+from config import MOCK_PROJECTS, STATUS_OPTIONS, PRIORITY_LEVELS, USE_BATCH_API, close_async_openai
+from utils import hash_key
+
+# pyarrow, openai and the agents (which pull in the OpenAI SDK) are imported where
+# they're first needed: Streamlit reruns this script on every interaction, and
+# most reruns never analyze a project or draw the actions table
 
 # Load environment variables
 load_dotenv()
@@ -35,43 +36,90 @@ if 'action_plan' not in st.session_state:
     st.session_state.action_plan = {}
 if 'processing' not in st.session_state:
     st.session_state.processing = False
+if 'last_input_hash' not in st.session_state:
+    # Digest of the research input behind the results currently shown
+    st.session_state.last_input_hash = None
+if 'batch_ids' not in st.session_state:
+    # Batch API requests of a background analysis, so a rerun resumes them instead of resubmitting
+    st.session_state.batch_ids = {}
+if 'pending_batch_project' not in st.session_state:
+    # Project whose background analysis is waiting on a batch
+    st.session_state.pending_batch_project = None
+
+# Initialize agents once per process; Streamlit reruns this script on every interaction
+@st.cache_resource
+def get_agents():
+    """Get the three agents, shared across reruns and sessions."""
+    from agents import make_agent
+    
+    return (
+        make_agent("research"),
+        make_agent("blocker_detection"),
+        make_agent("action_planner"),
+    )
+
+# Static mock data, built once at import
+_TEAM_MEMBERS = (
+    {"name": "Alex Johnson", "role": "Project Manager", "email": "alex.j@example.com"},
+    {"name": "Sam Lee", "role": "Lead Developer", "email": "sam.lee@example.com"},
+    {"name": "Jordan Taylor", "role": "UX Designer", "email": "jordan.t@example.com"},
+    {"name": "Casey Smith", "role": "QA Engineer", "email": "casey.s@example.com"},
+)
+_ASSIGNEES = tuple(m["name"] for m in _TEAM_MEMBERS)
+_STATUSES = tuple(STATUS_OPTIONS)
+_PRIORITIES = tuple(PRIORITY_LEVELS)
+_TASK_DUE_DAYS = range(1, 31)
 
-# Initialize agents
-research_agent = ResearchAgent(AGENT_CONFIG["research"])
-blocker_detection_agent = BlockerDetectionAgent(AGENT_CONFIG["blocker_detection"])
-action_planner_agent = ActionPlannerAgent(AGENT_CONFIG["action_planner"])
+_TASK_SPECS = (
+    ("Design", "user authentication"),
+    ("Implement", "database schema"),
+    ("Test", "API endpoints"),
+    ("Review", "UI components"),
+    ("Document", "API documentation"),
+    ("Deploy", "staging environment"),
+    ("Optimize", "database queries"),
+    ("Fix", "login issues"),
+)
+
+_RECENT_UPDATES = (
+    (1, "Completed initial project setup and repository configuration"),
+    (2, "Held kickoff meeting with all stakeholders"),
+    (3, "Created initial project timeline and milestones"),
+    (5, "Drafted technical requirements document"),
+    (7, "Completed competitive analysis"),
+)
 
 # Mock data generator
+@st.cache_data(ttl=3600, max_entries=16)
 def generate_mock_project_data(project_name: str) -> Dict[str, Any]:
-    """Generate mock project data for demonstration."""
-    team_members = [
-        {"name": "Alex Johnson", "role": "Project Manager", "email": "alex.j@example.com"},
-        {"name": "Sam Lee", "role": "Lead Developer", "email": "sam.lee@example.com"},
-        {"name": "Jordan Taylor", "role": "UX Designer", "email": "jordan.t@example.com"},
-        {"name": "Casey Smith", "role": "QA Engineer", "email": "casey.s@example.com"},
-    ]
+    """Generate mock project data for demonstration.
+    
+    Randomness is seeded from the project name, so each project always gets the
+    same data and the cached result matches what a fresh call would return.
+    """
+    rng = random.Random(project_name)
     
     # Generate some random dates
     today = datetime.now()
-    start_date = today - timedelta(days=random.randint(10, 30))
+    start_date = today - timedelta(days=rng.randint(10, 30))
     
     milestones = [
         {
             "name": "Project Kickoff",
             "due_date": (start_date + timedelta(days=5)).strftime("%Y-%m-%d"),
-            "status": random.choice(["Completed", "In Progress"]),
+            "status": rng.choice(["Completed", "In Progress"]),
             "description": "Official project kickoff meeting with all stakeholders"
         },
         {
             "name": "Requirements Finalized",
             "due_date": (start_date + timedelta(days=15)).strftime("%Y-%m-%d"),
-            "status": random.choice(["Completed", "In Progress", "Not Started"]),
+            "status": rng.choice(["Completed", "In Progress", "Not Started"]),
             "description": "All project requirements documented and approved"
         },
         {
             "name": "First Prototype",
             "due_date": (start_date + timedelta(days=30)).strftime("%Y-%m-%d"),
-            "status": random.choice(["In Progress", "Not Started"]),
+            "status": rng.choice(["In Progress", "Not Started"]),
             "description": "Initial working prototype ready for review"
         },
         {
@@ -88,53 +136,49 @@ def generate_mock_project_data(project_name: str) -> Dict[str, Any]:
         }
     ]
     
+    # Draw each task attribute for all tasks at once
+    task_count = len(_TASK_SPECS)
+    assignees = rng.choices(_ASSIGNEES, k=task_count)
+    statuses = rng.choices(_STATUSES, k=task_count)
+    priorities = rng.choices(_PRIORITIES, k=task_count)
+    due_days = rng.choices(_TASK_DUE_DAYS, k=task_count)
+    
     tasks = [
         {
             "id": f"TASK-{i+1}",
             "title": f"{task_type} {component}",
-            "assignee": random.choice([m["name"] for m in team_members]),
-            "status": random.choice(STATUS_OPTIONS),
-            "priority": random.choice(PRIORITY_LEVELS),
-            "due_date": (today + timedelta(days=random.randint(1, 30))).strftime("%Y-%m-%d"),
+            "assignee": assignee,
+            "status": status,
+            "priority": priority,
+            "due_date": (today + timedelta(days=days)).strftime("%Y-%m-%d"),
             "description": f"{task_type} for {component} component"
         }
-        for i, (task_type, component) in enumerate([
-            ("Design", "user authentication"),
-            ("Implement", "database schema"),
-            ("Test", "API endpoints"),
-            ("Review", "UI components"),
-            ("Document", "API documentation"),
-            ("Deploy", "staging environment"),
-            ("Optimize", "database queries"),
-            ("Fix", "login issues"),
-        ])
+        for i, ((task_type, component), assignee, status, priority, days) in enumerate(
+            zip(_TASK_SPECS, assignees, statuses, priorities, due_days)
+        )
     ]
     
+    authors = rng.choices(_ASSIGNEES, k=len(_RECENT_UPDATES))
     recent_updates = [
         {
             "date": (today - timedelta(days=days_ago)).strftime("%Y-%m-%d"),
-            "author": random.choice([m["name"] for m in team_members]),
+            "author": author,
             "update": update
         }
-        for days_ago, update in [
-            (1, "Completed initial project setup and repository configuration"),
-            (2, "Held kickoff meeting with all stakeholders"),
-            (3, "Created initial project timeline and milestones"),
-            (5, "Drafted technical requirements document"),
-            (7, "Completed competitive analysis")
-        ]
+        for (days_ago, update), author in zip(_RECENT_UPDATES, authors)
     ]
     
     return {
         "project_name": project_name,
         "description": f"A project focused on {project_name.lower()}",
         "start_date": start_date.strftime("%Y-%m-%d"),
-        "team_members": team_members,
+        "team_members": [dict(m) for m in _TEAM_MEMBERS],
         "milestones": milestones,
         "tasks": tasks,
         "recent_updates": recent_updates
     }
 
+@st.cache_data
 def generate_mock_chat_logs() -> List[Dict[str, str]]:
     """Generate mock chat logs for the project."""
     team_members = ["Alex Johnson", "Sam Lee", "Jordan Taylor", "Casey Smith"]
@@ -151,40 +195,92 @@ def generate_mock_chat_logs() -> List[Dict[str, str]]:
     
     return messages
 
+@st.cache_data(ttl=3600, max_entries=16)
+def build_research_input(project_name: str) -> Dict[str, Any]:
+    """Combine a project's mock data and chat logs into the Research Agent's input.
+    
+    Cached like the mock data it's built from, so reruns reuse the formatted text.
+    """
+    project_data = generate_mock_project_data(project_name)
+    chat_logs = generate_mock_chat_logs()
+    
+    team = ", ".join(m["name"] for m in project_data["team_members"])
+    milestones = "\n".join(
+        f"- {m['name']}: {m['status']} (Due: {m['due_date']})"
+        for m in project_data["milestones"]
+    )
+    recent_tasks = "\n".join(
+        f"- {t['title']} ({t['status']}, Priority: {t['priority']})"
+        for t in project_data["tasks"][:3]
+    )
+    
+    return {
+        "documents": [
+            {
+                "title": "Project Overview",
+                "content": f"Project: {project_name}\n"
+                          f"Description: {project_data['description']}\n"
+                          f"Team: {team}"
+            }
+        ],
+        "chats": chat_logs,
+        "text_content": [
+            f"Project Milestones:\n{milestones}",
+            f"\nRecent Tasks:\n{recent_tasks}"
+        ]
+    }
+
+async def render_partial_research(updates: asyncio.Queue, placeholder) -> None:
+    """Render the project summary from research fields as they stream in.
+    
+    Args:
+        updates: Queue of (field, value) pairs from the Research Agent, ended by None
+        placeholder: Streamlit placeholder to render the partial summary into
+    """
+    partial: Dict[str, Any] = {}
+    while (update := await updates.get()) is not None:
+        field, value = update
+        partial[field] = value
+        st.session_state.project_data = partial
+        with placeholder.container():
+            display_project_summary()
+
 async def process_project(project_name: str):
-    """Process the project using all three agents."""
+    """Process the project using all three agents.
+    
+    With the Batch API enabled this doesn't wait for batches: it runs as far as
+    the finished batches allow, then returns and is called again on later reruns.
+    """
+    from agents.base_agent import BatchPending, batch_registry
+    
     try:
         st.session_state.processing = True
+        research_agent, blocker_detection_agent, action_planner_agent = get_agents()
+        
+        if USE_BATCH_API:
+            # Agents record their batches here, submitting or checking each one
+            # once per run and picking them up again on the next
+            batch_registry.set(st.session_state.batch_ids)
         
         # Generate mock data
         with st.spinner("Generating mock project data..."):
-            project_data = generate_mock_project_data(project_name)
-            chat_logs = generate_mock_chat_logs()
-            
-            # Combine all data for the research agent
-            research_input = {
-                "documents": [
-                    {
-                        "title": "Project Overview",
-                        "content": f"Project: {project_name}\n"
-                                  f"Description: {project_data['description']}\n"
-                                  f"Team: {', '.join([m['name'] for m in project_data['team_members']])}"
-                    }
-                ],
-                "chats": chat_logs,
-                "text_content": [
-                    f"Project Milestones:\n" + 
-                    "\n".join([f"- {m['name']}: {m['status']} (Due: {m['due_date']})" 
-                             for m in project_data['milestones']]),
-                    "\nRecent Tasks:\n" +
-                    "\n".join([f"- {t['title']} ({t['status']}, Priority: {t['priority']})" 
-                              for t in project_data['tasks'][:3]])
-                ]
-            }
+            research_input = build_research_input(project_name)
+        
+        # Skip the agents entirely if the shown results came from this exact input
+        input_hash = hash_key(orjson.dumps(research_input, option=orjson.OPT_SORT_KEYS))
+        if input_hash == st.session_state.last_input_hash and st.session_state.action_plan:
+            st.session_state.processing = False
+            return
         
         # Step 1: Research Agent
+        # Fields are rendered as they stream in, then replaced by the full result
         with st.spinner("Researching project details..."):
-            research_results = await research_agent.process(research_input)
+            updates: asyncio.Queue = asyncio.Queue()
+            preview = st.empty()
+            renderer = asyncio.create_task(render_partial_research(updates, preview))
+            research_results = await research_agent.process(research_input, updates)
+            await renderer
+            preview.empty()
             st.session_state.project_data = research_results
         
         # Step 2: Blocker Detection Agent
@@ -197,12 +293,28 @@ async def process_project(project_name: str):
             action_plan = await action_planner_agent.process(research_results, blockers_data)
             st.session_state.action_plan = action_plan
         
+        st.session_state.last_input_hash = input_hash
+        st.session_state.batch_ids.clear()
+        st.session_state.pending_batch_project = None
         st.session_state.processing = False
         st.rerun()
         
+    except BatchPending as pending:
+        # Check again on a later rerun; finished stages are kept in batch_ids
+        print(f"Background analysis waiting: {pending}")
+        st.session_state.pending_batch_project = project_name
+        st.info(
+            f"Background analysis is waiting on the OpenAI Batch API ({pending.agent_type} step). "
+            "Results are checked each time the page reruns; use 'Check for results' in the sidebar."
+        )
+        st.session_state.processing = False
     except Exception as e:
+        st.session_state.pending_batch_project = None
         st.error(f"An error occurred: {str(e)}")
         st.session_state.processing = False
+    finally:
+        # The loop ends with this run, so release its client and connections
+        await close_async_openai()
 
 def display_project_summary():
     """Display the project summary section."""
@@ -289,6 +401,31 @@ def display_blockers():
         with st.expander("Analysis Summary"):
             st.write(data["summary"])
 
+# Action plan fields shown in the actions table, in display order
+ACTION_COLUMNS = ["task", "owner", "due_date", "priority", "status"]
+
+# Columns with few distinct values, stored dictionary-encoded
+_CATEGORICAL_ACTION_COLUMNS = frozenset(("priority", "status"))
+
+@st.cache_data(max_entries=16)
+def build_actions_table(actions_digest: str, _actions: List[Dict[str, Any]]):
+    """Build the actions table as an Arrow table, cached by a digest of the actions.
+    
+    The schema is known (all strings), so columns are built directly instead of
+    going through pandas dtype inference and a pandas-to-Arrow conversion.
+    Missing and null fields become "N/A"; empty strings are shown as-is.
+    """
+    import pyarrow as pa
+    
+    columns = {}
+    for col in ACTION_COLUMNS:
+        values = pa.array(
+            ["N/A" if (value := action.get(col)) is None else str(value) for action in _actions],
+            type=pa.string()
+        )
+        columns[col] = values.dictionary_encode() if col in _CATEGORICAL_ACTION_COLUMNS else values
+    return pa.table(columns)
+
 def display_action_plan():
     """Display the action plan section."""
     if not st.session_state.action_plan:
@@ -308,17 +445,13 @@ def display_action_plan():
     if "actions" in data and data["actions"]:
         st.subheader("Detailed Actions")
         
-        # Convert to DataFrame for better display
-        actions_df = pd.DataFrame(data["actions"])
-        
-        # Ensure all required columns exist
-        for col in ["task", "owner", "due_date", "priority", "status"]:
-            if col not in actions_df.columns:
-                actions_df[col] = "N/A"
+        # Repeat renders of the same plan reuse the cached table
+        actions_digest = hash_key(orjson.dumps(data["actions"], option=orjson.OPT_SORT_KEYS))
+        actions_table = build_actions_table(actions_digest, data["actions"])
         
         # Display the table
         st.dataframe(
-            actions_df[["task", "owner", "due_date", "priority", "status"]],
+            actions_table,
             column_config={
                 "task": "Task",
                 "owner": "Owner",
@@ -363,12 +496,18 @@ def main():
         )
         
         # Process button
-        if st.button("Analyze Project", disabled=st.session_state.processing):
-            asyncio.run(process_project(selected_project))
+        analyze = st.button("Analyze Project", disabled=st.session_state.processing)
         
         # Display status
         if st.session_state.processing:
             st.info("Processing project data... Please wait.")
+        elif st.session_state.pending_batch_project:
+            st.info(
+                f"Background analysis of {st.session_state.pending_batch_project} is running "
+                "on the OpenAI Batch API, which can take minutes to hours. Results are "
+                "checked each time the page reruns."
+            )
+            st.button("Check for results")
         
         st.markdown("---")
         st.markdown("### About")
@@ -381,6 +520,13 @@ def main():
         st.markdown("- Blocker Detection: Identifies risks and blockers")
         st.markdown("- Action Planner: Recommends next steps")
     
+    # Run the analysis outside the sidebar so partial results render in the main area
+    if analyze:
+        asyncio.run(process_project(selected_project))
+    elif st.session_state.pending_batch_project:
+        # Resume a background analysis; this only checks its batches once
+        asyncio.run(process_project(st.session_state.pending_batch_project))
+    
     # Main content area
     if st.session_state.project_data:
         display_project_summary()
@@ -392,9 +538,8 @@ def main():
         st.info("👈 Select a project and click 'Analyze Project' to get started.")
 
 if __name__ == "__main__":
-    # Set OpenAI API key from environment variable
+    # The agents read the OpenAI API key from the environment themselves
     if "OPENAI_API_KEY" not in os.environ:
         st.error("Error: OPENAI_API_KEY environment variable is not set.")
     else:
-        openai.api_key = os.environ["OPENAI_API_KEY"]
         main()
\ No newline at end of file
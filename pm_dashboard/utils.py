@@ -1,9 +1,12 @@
 import os
-import json
+import time
+import hashlib
 import logging
 from functools import wraps
-from typing import Any, Callable, Optional, TypeVar, Union
-from redis import Redis, ConnectionError, TimeoutError
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+import orjson
+import zstandard
+from redis import BlockingConnectionPool, Redis, ConnectionError, TimeoutError
 from redis.exceptions import RedisError
 
 # Set up logging
@@ -13,13 +16,35 @@ logger = logging.getLogger(__name__)
 # Type variable for generic function typing
 F = TypeVar('F', bound=Callable[..., Any])
 
+# Structured values are stored as zstd-compressed JSON. Every zstd frame starts
+# with this magic number, which can never begin a UTF-8 string, so compressed
+# and plain values can be told apart on read.
+ZSTD_FRAME_MAGIC = b'\x28\xb5\x2f\xfd'
+ZSTD_LEVEL = 3
+
+# After a connection failure, reconnecting is attempted at most this often
+RECONNECT_INTERVAL_SECONDS = 5.0
+
+# Connections shared by all threads; callers wait up to the timeout for a free one
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 32))
+REDIS_POOL_TIMEOUT = 5
+
+# BlockingConnectionPool raises a plain ConnectionError with this message when
+# no connection frees up in time; the server itself is still reachable
+POOL_EXHAUSTED_MESSAGE = "No connection available"
+
+# Keys fetched per SCAN step and deleted per DEL command when clearing the cache
+CLEAR_BATCH_SIZE = 500
+
 class RedisManager:
     """
     Redis connection manager with connection pooling and basic caching utilities.
     """
     _instance = None
+    _pool = None
     _redis_client = None
     _is_connected = False
+    _last_reconnect_attempt = 0.0
     
     def __new__(cls):
         if cls._instance is None:
@@ -37,20 +62,25 @@ class RedisManager:
             return
             
         try:
-            self._redis_client = Redis.from_url(
+            # A bounded pool, so concurrent sessions each get their own connection
+            # without opening an unbounded number of them
+            self._pool = BlockingConnectionPool.from_url(
                 self.redis_url,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_POOL_TIMEOUT,
                 socket_timeout=5,
                 socket_connect_timeout=5,
                 retry_on_timeout=True,
-                decode_responses=True
+                decode_responses=False  # Values may be compressed bytes
             )
+            self._redis_client = Redis(connection_pool=self._pool)
             # Test the connection
             self._redis_client.ping()
             self._is_connected = True
             logger.info("Successfully connected to Redis")
         except (ConnectionError, TimeoutError) as e:
             logger.error(f"Failed to connect to Redis: {e}")
-            self._is_connected = False
+            self._mark_disconnected()
     
     @property
     def client(self) -> Optional[Redis]:
@@ -58,67 +88,173 @@ class RedisManager:
         return self._redis_client if self._is_connected else None
     
     def is_connected(self) -> bool:
-        """Check if the Redis connection is active."""
-        if not self._is_connected or not self._redis_client:
+        """
+        Check if the Redis connection is usable.
+        
+        This doesn't touch the network while the connection is up: failures are
+        noticed by the operations themselves, which mark the connection down. Once
+        down, a reconnect is attempted at most every RECONNECT_INTERVAL_SECONDS.
+        """
+        if self._is_connected:
+            return True
+        if not self._redis_client:
+            return False
+        if time.monotonic() - self._last_reconnect_attempt < RECONNECT_INTERVAL_SECONDS:
             return False
         try:
             self._redis_client.ping()
-            return True
+            self._is_connected = True
+            logger.info("Reconnected to Redis")
         except RedisError:
-            self._is_connected = False
-            return False
+            self._mark_disconnected()
+        return self._is_connected
+    
+    def _connection_failed(self, error: Exception) -> None:
+        """
+        Handle a connection error raised by an operation.
+        
+        A busy pool only means this call misses the cache; anything else means
+        the server is unreachable, so the connection is marked down.
+        """
+        if isinstance(error, ConnectionError) and str(error).startswith(POOL_EXHAUSTED_MESSAGE):
+            logger.warning(f"Redis connection pool exhausted: {error}")
+            return
+        logger.error(f"Redis connection lost: {error}")
+        self._mark_disconnected()
+    
+    def _mark_disconnected(self) -> None:
+        """Mark the connection down and start the reconnect interval."""
+        self._is_connected = False
+        self._last_reconnect_attempt = time.monotonic()
+    
+    @staticmethod
+    def _encode(value: Any) -> Union[str, int, float, bytes]:
+        """Encode a value for storage, compressing anything that isn't a scalar."""
+        if isinstance(value, (str, int, float, bool)):
+            return value
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(orjson.dumps(value))
+    
+    @staticmethod
+    def _decode(value: Optional[bytes]) -> Optional[Any]:
+        """Decode a stored value, falling back to the raw string for non-JSON values."""
+        if value is None:
+            return None
+        if value.startswith(ZSTD_FRAME_MAGIC):
+            return orjson.loads(zstandard.ZstdDecompressor().decompress(value))
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return value.decode('utf-8')
     
     def get(self, key: str) -> Optional[Any]:
         """Get a value from Redis."""
         if not self.is_connected():
             return None
         try:
-            value = self._redis_client.get(key)
-            if value is None:
-                return None
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
-        except RedisError as e:
+            return self._decode(self._redis_client.get(key))
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
+            return None
+        except (zstandard.ZstdError, orjson.JSONDecodeError, RedisError) as e:
             logger.error(f"Redis get error: {e}")
             return None
     
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values from Redis in a single MGET round trip."""
+        if not self.is_connected() or not keys:
+            return [None] * len(keys)
+        try:
+            return [self._decode(value) for value in self._redis_client.mget(keys)]
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
+            return [None] * len(keys)
+        except (zstandard.ZstdError, orjson.JSONDecodeError, RedisError) as e:
+            logger.error(f"Redis mget error: {e}")
+            return [None] * len(keys)
+    
     def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
         """Set a value in Redis with optional expiration in seconds."""
         if not self.is_connected():
             return False
         try:
-            if not isinstance(value, (str, int, float, bool)):
-                value = json.dumps(value)
-            return bool(self._redis_client.set(key, value, ex=ex))
+            return bool(self._redis_client.set(key, self._encode(value), ex=ex))
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
+            return False
         except (TypeError, RedisError) as e:
             logger.error(f"Redis set error: {e}")
             return False
     
+    def mset(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        """Set several values in Redis in a single pipelined round trip, with optional expiration in seconds."""
+        if not self.is_connected() or not mapping:
+            return False
+        try:
+            pipe = self._redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(key, self._encode(value), ex=ex)
+            return all(pipe.execute())
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
+            return False
+        except (TypeError, RedisError) as e:
+            logger.error(f"Redis mset error: {e}")
+            return False
+    
     def delete(self, *keys: str) -> int:
         """Delete one or more keys from Redis."""
         if not self.is_connected() or not keys:
             return 0
         try:
             return self._redis_client.delete(*keys)
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
+            return 0
         except RedisError as e:
             logger.error(f"Redis delete error: {e}")
             return 0
     
     def clear_cache(self, pattern: str = '*') -> int:
-        """Clear cache entries matching a pattern."""
+        """
+        Clear cache entries matching a pattern.
+        
+        Uses incremental SCAN rather than KEYS, which blocks the server while it
+        walks the whole keyspace, and sends the deletes in one pipeline.
+        """
         if not self.is_connected():
             return 0
         try:
-            keys = self._redis_client.keys(pattern)
-            if keys:
-                return self._redis_client.delete(*keys)
+            pipe = self._redis_client.pipeline(transaction=False)
+            batch = []
+            for key in self._redis_client.scan_iter(match=pattern, count=CLEAR_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= CLEAR_BATCH_SIZE:
+                    pipe.delete(*batch)
+                    batch = []
+            if batch:
+                pipe.delete(*batch)
+            return sum(pipe.execute())
+        except (ConnectionError, TimeoutError) as e:
+            self._connection_failed(e)
             return 0
         except RedisError as e:
             logger.error(f"Redis clear_cache error: {e}")
             return 0
 
+def hash_key(data: Union[str, bytes]) -> str:
+    """
+    Hash data into a short, stable hex digest for use in cache keys.
+    
+    Args:
+        data: Text or bytes to hash
+        
+    Returns:
+        32-character BLAKE2b hex digest
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
 def cache_result(ttl: int = 300, key_prefix: str = "cache:"):
     """
     Decorator to cache the result of a function.
@@ -134,8 +270,13 @@ def cache_result(ttl: int = 300, key_prefix: str = "cache:"):
             if not redis.is_connected():
                 return func(*args, **kwargs)
                 
-            # Create a unique cache key based on function name and arguments
-            cache_key = f"{key_prefix}{func.__name__}:{str(args)}:{str(kwargs)}"
+            # Create a unique cache key by hashing a canonical encoding of the arguments
+            arguments = orjson.dumps(
+                {"args": args, "kwargs": kwargs},
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+                default=repr
+            )
+            cache_key = f"{key_prefix}{func.__name__}:{hash_key(arguments)}"
             
             # Try to get cached result
             cached = redis.get(cache_key)